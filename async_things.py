@@ -11,16 +11,16 @@ async def some_api_call(payload:int):
     print(f"end {payload}")
 
 
-tasks = []
-for i in range(3):
-    tasks.append(some_api_call(i))
+def read_file(path:str) -> str:
+    with open(path, 'r') as f:
+        return f.read()
 
-async def main():
-    await asyncio.gather(*tasks)
-
-asyncio.run(main())
-# print(main())
 
-with open("some.txt", 'r') as f:
-    print(f.read())
+async def main():
+    # the blocking file read runs in a worker thread, overlapping with the simulated API calls
+    *_, text = await asyncio.gather(*[some_api_call(i) for i in range(3)], asyncio.to_thread(read_file, "some.txt"))
+    print(text)
 
+if __name__ == "__main__":
+    asyncio.run(main())
+    # print(main())
@@ -21,15 +21,17 @@ Environment Variables Required:
     - AZURE_AI_MODEL_DEPLOYMENT_NAME: Your Azure OpenAI deployment name
 
 Usage:
-    1. Ensure Qdrant is running (docker run -p 6333:6333 qdrant/qdrant)
+    1. Ensure Qdrant is running (docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant)
     2. Set environment variables in .env file
-    3. Run prepare_data() once to ingest HR policy documents
+    3. Run prepare_data() once to ingest HR policy documents (uncomment it in the __main__ block)
     4. Run main() to query the agent
 
 Example:
     $ python main.py
 """
 
+import asyncio
+from collections.abc import Sequence
 from typing import Final
 
 from agent_framework import ai_function
@@ -39,7 +41,8 @@ from dotenv import load_dotenv
 from pydantic import Field, BaseModel
 
 from tools import get_prepared_collection
-from utils import convert_pdf_to_chunks, create_qdrant_collection, get_embeddings_and_text, ingest_vectors_in_qdrant
+from utils import convert_pdfs_to_chunks, create_qdrant_collection, get_embeddings_and_text, ingest_vectors_in_qdrant, \
+    qdrant_client
 
 # Load environment variables from .env file
 load_dotenv()
@@ -61,36 +64,47 @@ client = AzureOpenAIChatClient(
 # Qdrant collection name for storing HR policy embeddings
 COLLECTION_NAME: Final[str] = "agentic_ai_power_workshop"
 
-def prepare_data():
+# HR policy documents ingested by prepare_data
+HR_POLICY_PDFS: Final[tuple[str, ...]] = ("HR-POLICIES-1-1-1.pdf",)
+
+def prepare_data(pdf_paths: Sequence[str] = HR_POLICY_PDFS):
     """
     Prepare and ingest HR policy data into Qdrant vector database.
 
     This function performs the complete data ingestion pipeline:
-    1. Creates a new Qdrant collection for storing embeddings
-    2. Converts PDF document into text chunks
-    3. Generates embeddings for each chunk using sentence-transformers
+    1. Converts the PDF documents into text chunks, in parallel worker processes when
+       there is more than one document
+    2. Drops any existing collection and creates a fresh one for storing embeddings
+    3. Generates embeddings for all chunks in a single batched call using sentence-transformers
     4. Ingests embeddings and text into Qdrant for semantic search
 
-    Note: This should be run ONCE to populate the database.
-          Comment out after initial data ingestion to avoid duplicates.
+    Note: This should be run ONCE to populate the database. Running it again rebuilds
+          the collection from scratch, so no chunks or settings of an earlier ingest survive.
+          Call it only from the __main__ block below: worker processes re-import
+          this module, so a module-level call would run ingestion again in each of them.
 
     Steps:
-        - create_qdrant_collection: Creates vector collection with proper dimensions
-        - convert_pdf_to_chunks: Uses Docling to extract and chunk PDF content
+        - convert_pdfs_to_chunks: Uses Docling to extract and chunk PDF content
+        - create_qdrant_collection: Creates vector collection with proper dimensions and index settings
         - get_embeddings_and_text: Generates vector embeddings for semantic search
         - ingest_vectors_in_qdrant: Stores vectors in Qdrant database
 
+    Args:
+        pdf_paths (Sequence[str]): Paths of the HR policy PDFs to ingest
+
     Returns:
         None
     """
+    # Convert before touching Qdrant or the GPU so the worker processes start from a clean parent
+    chunks = convert_pdfs_to_chunks(pdf_paths)
+    # Point ids are chunk positions, so a collection from an earlier ingest (with a different
+    # chunk count or older collection settings) cannot be updated in place
+    if qdrant_client.collection_exists(COLLECTION_NAME):
+        qdrant_client.delete_collection(COLLECTION_NAME)
     create_qdrant_collection(COLLECTION_NAME)
-    chunks = convert_pdf_to_chunks("HR-POLICIES-1-1-1.pdf")
-    embeddings_and_text = get_embeddings_and_text(chunks)
-    ingest_vectors_in_qdrant(COLLECTION_NAME, embeddings_and_text)
-
+    texts, vectors = get_embeddings_and_text(chunks)
+    ingest_vectors_in_qdrant(COLLECTION_NAME, texts, vectors)
 
-# Uncomment the line below to run data preparation (only needed once)
-# prepare_data() 
 
 # Create the Azure OpenAI agent with RAG capabilities
 # The agent is configured with:
@@ -123,6 +137,29 @@ class AnswerAndConfidence(BaseModel):
     answer: str = Field(..., description="Answer to the question")
     confidence: float = Field(..., description="Confidence score of the answer")
 
+async def answer_questions(questions: Sequence[str]):
+    """
+    Answer several HR policy questions concurrently.
+
+    Each question runs as its own agent task inside an asyncio.TaskGroup, so the
+    LLM calls and Qdrant searches of different questions overlap instead of running
+    one after another. Useful for offline evaluation over a list of questions.
+
+    If any question fails, the remaining tasks are cancelled and the error is
+    raised as part of an ExceptionGroup.
+
+    Args:
+        questions (Sequence[str]): HR policy questions to ask the agent
+
+    Returns:
+        list: Agent responses in the same order as the questions, each structured
+              according to AnswerAndConfidence
+    """
+    async with asyncio.TaskGroup() as task_group:
+        tasks = [task_group.create_task(agent.run(question, response_format=AnswerAndConfidence))
+                 for question in questions]
+    return [task.result() for task in tasks]
+
 async def main():
     """
     Main execution function for the Agentic RAG system.
@@ -161,5 +198,6 @@ async def main():
 
 # Entry point: Run the async main function
 if __name__ == "__main__":
-    import asyncio
+    # Uncomment the line below to run data preparation (only needed once)
+    # prepare_data()
     asyncio.run(main())
\ No newline at end of file
@@ -1,24 +1,71 @@
+import asyncio
+import functools
+import os
+
 from agent_framework import ai_function
-from qdrant_client.http.models import QueryResponse
+from qdrant_client.http.models import QueryResponse, QueryRequest, SearchParams, QuantizationSearchParams
 
 from utils import get_transformer_model
 
 
+def _normalize_query(query:str) -> str:
+    # the model is uncased, so lowercasing and collapsing whitespace lets near-identical queries share a cache entry
+    return " ".join(query.lower().split())
+
+
+@functools.lru_cache(maxsize=512)
+def _encode_normalized_query(query:str):
+    return get_transformer_model().encode(query, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def encode_query(query:str):
+    return _encode_normalized_query(_normalize_query(query))
+
+
+def encode_queries(queries:list[str]):
+    return get_transformer_model().encode([_normalize_query(query) for query in queries], batch_size=8,
+                                          convert_to_numpy=True, normalize_embeddings=True)
+
+
+def _search_params() -> SearchParams:
+    return SearchParams(hnsw_ef=int(os.getenv("HNSW_EF_SEARCH", "128")),
+                        quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=2.0))
+
+
+def _result_texts(results:QueryResponse) -> list[str]:
+    if os.getenv("RAG_DEBUG") == "1":
+        for result in results.points:
+            print(f"Score: {result.score}, Text: {result.payload["text"]}")
+    return [result.payload["text"] for result in results.points]
+
+
+def _search(collection_name:str, query:str | list[str]):
+    if os.getenv("RAG_DEBUG") == "1":
+        print(f"searching in qdrant for query: {query}")
+    from utils import qdrant_client
+    if isinstance(query, str):
+        results:QueryResponse = qdrant_client.query_points(collection_name=collection_name,
+                                             query=encode_query(query), limit=5,
+                                             search_params=_search_params())
+        return _result_texts(results)
+
+    search_params = _search_params()
+    batch_results:list[QueryResponse] = qdrant_client.query_batch_points(collection_name=collection_name, requests=[
+        QueryRequest(query=vector.tolist(), limit=5, params=search_params, with_payload=True)
+        for vector in encode_queries(query)
+    ])
+    return [_result_texts(results) for results in batch_results]
+
+
 def get_prepared_collection(collection_name:str):
     @ai_function
-    def search_in_qdrant(query:str):
+    async def search_in_qdrant(query:str | list[str]):
         """
         Searches the qdrant collection for the query and returns the top 5 results.
-        :param query: Query text you want similar text for.
-        :return: Top 5 results.
+        Pass a list of queries to search several sub-questions in one round-trip.
+        :param query: Query text you want similar text for, or a list of such query texts.
+        :return: Top 5 results, or a list with the top 5 results of each query.
         """
-        print(f"searching in qdrant for query: {query}")
-        from utils import qdrant_client
-        results:QueryResponse = qdrant_client.query_points(collection_name=collection_name,
-                                             query=get_transformer_model().encode(query), limit=5)
-
-        results_ = [f"Score: {result.score}, Text: {result.payload["text"]}" for result in results.points]
-        for item in results_:
-            print(item)
-        return results_
-    return search_in_qdrant
\ No newline at end of file
+        # the encode and the Qdrant call block, so they run in a worker thread to keep the event loop free
+        return await asyncio.to_thread(_search, collection_name, query)
+    return search_in_qdrant
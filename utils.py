@@ -1,59 +1,119 @@
-from pydantic import BaseModel
+import importlib.util
+import os
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 
-from qdrant_client.http.models import VectorParams, PointStruct, Distance
+from qdrant_client.http.models import VectorParams, Distance, BinaryQuantization, BinaryQuantizationConfig, \
+    HnswConfigDiff
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
 
 transformer_model = None
+transformer_model_lock = threading.Lock()
+
+def _onnx_runtime_available() -> bool:
+    # find_spec only locates the packages; it does not import onnxruntime or the optimum backend
+    return (importlib.util.find_spec("onnxruntime") is not None
+            and importlib.util.find_spec("optimum") is not None
+            and importlib.util.find_spec("optimum.onnxruntime") is not None)
 
 def get_transformer_model():
     global transformer_model
-    if transformer_model is None:
-        transformer_model = SentenceTransformer("all-mpnet-base-v2")
+    # searches run in worker threads, so concurrent first calls must not each load the model
+    with transformer_model_lock:
+        if transformer_model is None:
+            if torch.cuda.is_available():
+                transformer_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cuda")
+                # FP16 halves memory traffic on the GPU; CPU kernels stay in FP32
+                transformer_model.half()
+                if os.getenv("EMBEDDING_TORCH_COMPILE") == "1":
+                    # compile the HF encoder that SentenceTransformer wraps; compiling the wrapper itself would leave
+                    # encode() on the eager path. Batches are padded to their longest chunk, hence dynamic shapes.
+                    transformer_module = transformer_model[0]
+                    transformer_module.auto_model = torch.compile(transformer_module.auto_model, dynamic=True)
+            elif _onnx_runtime_available():
+                # same weights exported to ONNX, so vectors stay compatible with an index built on the GPU
+                transformer_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", backend="onnx")
+            else:
+                transformer_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
     return transformer_model
 
-qdrant_client = QdrantClient("http://localhost:6333")
+# a single module-level client keeps one gRPC channel open for all calls
+qdrant_client = QdrantClient("localhost", grpc_port=6334, prefer_grpc=True)
 
 def create_qdrant_collection(name:str) -> bool:
-    collections = qdrant_client.get_collections().collections
-    if name in collections:
+    if qdrant_client.collection_exists(name):
         return True
     else:
         qdrant_client.create_collection(
             collection_name=name,
-            vectors_config=VectorParams(size=get_transformer_model().get_sentence_embedding_dimension(), distance=Distance.COSINE)
+            vectors_config=VectorParams(size=get_transformer_model().get_sentence_embedding_dimension(), distance=Distance.DOT,
+                                        on_disk=True),
+            # full vectors stay on disk for rescoring, 1-bit codes are kept in RAM for the HNSW search
+            quantization_config=BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True)),
+            # the corpus is small, so a denser graph costs little memory and buys recall
+            hnsw_config=HnswConfigDiff(m=24, ef_construct=200),
+            # chunk text is only read for the final top-k, so it does not need to stay in RAM
+            on_disk_payload=True,
         )
         return True
 
-class EmbeddingsAndText(BaseModel):
-    text: str
-    embedding: list[float]
-
-def get_embeddings_and_text(texts:list[str]):
+def get_embeddings_and_text(texts:list[str]) -> tuple[list[str], np.ndarray]:
     model = get_transformer_model()
-    embeddings_and_text:list[EmbeddingsAndText] = []
-    for text in texts:
-        embeddings_and_text.append(EmbeddingsAndText(text=text, embedding=model.encode(text).tolist()))
-    return embeddings_and_text
-
-def ingest_vectors_in_qdrant(name:str, embeddings_and_text:list[EmbeddingsAndText]):
-    qdrant_client.upload_points(collection_name=name, points=[
-        PointStruct(
-            id=idx, vector=doc.embedding, payload={"text":doc.text}
-        )
-        for idx, doc in enumerate(embeddings_and_text)
-    ],)
+    vectors = model.encode(texts, batch_size=64, convert_to_numpy=True,
+                           normalize_embeddings=True, show_progress_bar=False)
+    # one contiguous (N, dim) float32 buffer, also when the model runs in FP16 on CUDA
+    return texts, np.ascontiguousarray(vectors, dtype=np.float32)
+
+def ingest_vectors_in_qdrant(name:str, texts:list[str], vectors:np.ndarray):
+    qdrant_client.upload_collection(collection_name=name, vectors=vectors,
+                                    payload=[{"text": text} for text in texts],
+                                    # fixed ids make re-ingesting overwrite the same points instead of duplicating them
+                                    ids=range(len(texts)), batch_size=256)
+
+
+document_converter = None
+
+def get_document_converter():
+    global document_converter
+    if document_converter is None:
+        from docling.document_converter import DocumentConverter
+        document_converter = DocumentConverter()
+    return document_converter
+
+tokenizer = None
 
+def get_tokenizer():
+    global tokenizer
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+    return tokenizer
 
-def convert_pdf_to_chunks(file_path:str, chunk_size=350, chunk_overlap=50):
-    from docling.document_converter import DocumentConverter
+def convert_pdf_to_chunks(file_path:str, chunk_size=256, chunk_overlap=32):
     from langchain_text_splitters import RecursiveCharacterTextSplitter
-    converter = DocumentConverter()
-    result = converter.convert(file_path)
+    result = get_document_converter().convert(file_path)
     text = result.document.export_to_text()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
-                                              separators=["\n\n", "\n", " ", ""], length_function=len)
+    # chunk_size and chunk_overlap count mpnet tokens, keeping chunks within the model's 384-token window
+    splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        get_tokenizer(), chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", " ", ""])
     split_text = splitter.split_text(text)
     print(f"Total chunks: {len(split_text)}")
     return split_text
 
+def convert_pdfs_to_chunks(file_paths:Sequence[str]) -> list[str]:
+    # Docling conversion is CPU-bound, so separate PDFs are converted in parallel worker processes
+    if not file_paths:
+        return []
+    if len(file_paths) == 1:
+        return convert_pdf_to_chunks(file_paths[0])
+    with ProcessPoolExecutor(max_workers=min(len(file_paths), os.cpu_count() or 1)) as executor:
+        chunks_per_document = list(executor.map(convert_pdf_to_chunks, file_paths))
+    return [chunk for chunks in chunks_per_document for chunk in chunks]